@@ -6,11 +6,31 @@ import numpy as np
 import librosa
 import sqlite3
 import soundfile as sf
-from scipy.spatial.distance import cosine
-from scipy.signal import butter, filtfilt
+import scipy.fft
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.linalg.blas import sgemv
+from scipy.signal import butter, filtfilt, get_window, sosfilt_zi
 import tempfile
+import threading
+import hashlib
+import functools
+import json
+import struct
+import uuid
+from collections import OrderedDict
+import torch
 from speechbrain.pretrained import SpeakerRecognition
 
+try:
+    from numba import njit
+except ImportError:  # fall back to SciPy's filtfilt and a NumPy noise gate
+    njit = None
+
+try:
+    import pyfftw.builders
+except ImportError:  # fall back to scipy.fft
+    pyfftw = None
+
 app = Flask(__name__)
 
 # Recording settings
@@ -20,83 +40,277 @@ DURATION = 10  # seconds
 SAMPLE_RATE = 16000
 DB_FILE = "speaker_database.db"
 
+# Packed copy of the database embeddings (one int8 row per speaker) used for identification
+EMBEDDING_DIM = 192  # ECAPA-TDNN embedding size
+EMBEDDINGS_FILE = "speaker_embeddings.npy"
+NAMES_FILE = "speaker_names.json"
+
+# ECAPA-TDNN normalizes its own features, the handcrafted denoising chain is optional
+APPLY_DENOISE = False
+
+# Spectral subtraction settings (librosa's defaults, kept in float32)
+N_FFT = 2048
+HOP_LENGTH = N_FFT // 4
+STFT_WINDOW = get_window('hann', N_FFT, fftbins=True).astype(np.float32)
+NOISE_SAMPLES = SAMPLE_RATE // 2  # noise is estimated from the first 0.5s
+NOISE_FRAMES = 1 + NOISE_SAMPLES // HOP_LENGTH
+CLIP_FRAMES = 1 + (DURATION * SAMPLE_RATE) // HOP_LENGTH  # a full recording
+
+# FFTW plans for the fixed frame counts of a recording and of its noise sample, keyed by
+# (frames, N_FFT) and planned once at startup when pyFFTW is available
+_FFT_PLANS = {}
+if pyfftw is not None:
+    for n_frames in (NOISE_FRAMES, CLIP_FRAMES):
+        _FFT_PLANS[(n_frames, N_FFT)] = (
+            pyfftw.builders.rfft(pyfftw.empty_aligned((n_frames, N_FFT), dtype='float32'),
+                                 axis=-1, threads=os.cpu_count()),
+            threading.Lock())
+
+# Single database connection shared by all request threads, in WAL mode
+_CONN = sqlite3.connect(DB_FILE, check_same_thread=False)
+_CONN.execute("PRAGMA journal_mode=WAL")
+_CONN.execute("PRAGMA synchronous=NORMAL")
+_DB_LOCK = threading.Lock()
+
+# In-memory copy of the registered embeddings, rebuilt after each registration
+_SPK_CACHE = {"names": [], "M": None, "dirty": True}
+_SPK_LOCK = threading.Lock()
+
+# Embeddings of recently processed recordings, keyed by the SHA-256 of the samples
+_EMB_CACHE = OrderedDict()
+_EMB_CACHE_SIZE = 128
+_EMB_LOCK = threading.Lock()
+
+# Noise floor of recent recording sessions (one per open page), reused by the following clips
+# of the same session until it is NOISE_SESSION_TTL seconds old
+_NOISE_CACHE = OrderedDict()
+_NOISE_CACHE_SIZE = 8
+NOISE_SESSION_TTL = 300  # seconds
+_NOISE_LOCK = threading.Lock()
+
+# Running ffmpeg captures, keyed by recording id, dropped RECORDING_TTL seconds after they end if unused
+_RECORDINGS = {}
+RECORDING_TTL = 60  # seconds
+
 # Create recordings directory if it doesn't exist
 os.makedirs(RECORDING_DIR, exist_ok=True)
 
-# Initialize SpeechBrain model
-spk_rec = SpeakerRecognition.from_hparams(source="speechbrain/spkrec-ecapa-voxceleb",
-                                          savedir="tmp_model")
+# SpeechBrain model, loaded on first use and shared by all request threads
+_MODEL = None
+_MODEL_LOCK = threading.Lock()
+
+def get_model():
+    """Returns the SpeechBrain speaker model, loading it on the first call."""
+    global _MODEL
+    if _MODEL is None:
+        with _MODEL_LOCK:
+            if _MODEL is None:
+                torch.set_num_threads(os.cpu_count())
+                model = SpeakerRecognition.from_hparams(source="speechbrain/spkrec-ecapa-voxceleb",
+                                                        savedir="tmp_model")
+                model.mods.eval()
+                _MODEL = model
+    return _MODEL
+
+def cpu_has_bf16():
+    """Whether the CPU computes natively in bfloat16 (AVX-512 BF16 or AMX)."""
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+# Run the model in bfloat16 only where the hardware supports it
+USE_BF16 = cpu_has_bf16()
 
 def initialize_db():
     """Initialize SQLite database for storing speaker embeddings."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS speakers 
-                      (name TEXT PRIMARY KEY, embedding BLOB)''')
-    conn.commit()
-    conn.close()
+    with _DB_LOCK, _CONN:
+        _CONN.execute('''CREATE TABLE IF NOT EXISTS speakers 
+                         (name TEXT PRIMARY KEY, embedding BLOB)''')
+
+    # The database is the source of truth, resync the packed copy in case it was edited or reset
+    with _SPK_LOCK:
+        rebuild_packed_embeddings()
+        _SPK_CACHE["dirty"] = True
+
+def load_audio(audio_file):
+    """Loads an audio file as mono float32 samples at SAMPLE_RATE."""
+    audio, sr = sf.read(audio_file, dtype='float32', always_2d=False)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1, dtype=np.float32)
+    if sr != SAMPLE_RATE:
+        audio = librosa.resample(audio, orig_sr=sr, target_sr=SAMPLE_RATE).astype(np.float32, copy=False)
+    return audio
+
+def extract_embedding(audio, session_id=None):
+    """Extracts the speaker embedding of mono samples at SAMPLE_RATE, reusing the result for recordings already seen."""
+    audio = np.ascontiguousarray(audio, dtype=np.float32)
+    # With denoising on, the embedding also depends on the session's noise estimate
+    key = (hashlib.sha256(audio).digest(), session_id if APPLY_DENOISE else None)
+
+    with _EMB_LOCK:
+        if key in _EMB_CACHE:
+            _EMB_CACHE.move_to_end(key)
+            return _EMB_CACHE[key]
+
+    audio = remove_noise(audio, SAMPLE_RATE, session_id)
 
- 
+    signal = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32)).unsqueeze(0)
+    # Load the model outside inference mode so its parameters stay regular tensors
+    model = get_model()
+    with torch.inference_mode(), torch.autocast('cpu', dtype=torch.bfloat16, enabled=USE_BF16):
+        embedding = model.encode_batch(signal).squeeze()
+    # Embeddings are always compared in float32
+    embedding = embedding.float().cpu().numpy()
+    embedding.flags.writeable = False
 
-def register_speaker(name, audio_file):
+    with _EMB_LOCK:
+        _EMB_CACHE[key] = embedding
+        if len(_EMB_CACHE) > _EMB_CACHE_SIZE:
+            _EMB_CACHE.popitem(last=False)
+    return embedding
+
+def quantize_embedding(embedding):
+    """Quantizes an embedding to int8 with a single scale, packed as the int8 values followed by the float32 scale."""
+    scale = max(float(np.abs(embedding).max()) / 127, 1e-10)
+    q = np.round(embedding / scale).astype(np.int8)
+    return q.tobytes() + struct.pack('f', scale)
+
+def dequantize_embeddings(Q):
+    """Expands packed int8 rows (see quantize_embedding) back to normalized float32 rows."""
+    Q = np.asarray(Q)
+    scales = np.ascontiguousarray(Q[:, EMBEDDING_DIM:]).view(np.float32)
+    M = np.ascontiguousarray(Q[:, :EMBEDDING_DIM], dtype=np.float32)
+    M *= scales
+    M /= np.maximum(np.linalg.norm(M, axis=1, keepdims=True), 1e-10)
+    return M
+
+def write_packed_embeddings(names, Q):
+    """Writes the packed int8 embedding rows and the list of names in the same row order."""
+    with open(EMBEDDINGS_FILE + ".tmp", 'wb') as f:
+        np.save(f, np.ascontiguousarray(Q, dtype=np.int8))
+    os.replace(EMBEDDINGS_FILE + ".tmp", EMBEDDINGS_FILE)
+    with open(NAMES_FILE + ".tmp", 'w') as f:
+        json.dump(names, f)
+    os.replace(NAMES_FILE + ".tmp", NAMES_FILE)
+
+def read_packed_embeddings(mmap_mode=None):
+    """Reads the packed embedding rows and names, rebuilding them from the database if missing or inconsistent."""
+    if os.path.exists(EMBEDDINGS_FILE) and os.path.exists(NAMES_FILE):
+        Q = np.load(EMBEDDINGS_FILE, mmap_mode=mmap_mode)
+        with open(NAMES_FILE) as f:
+            names = json.load(f)
+        # The two files are replaced one after the other, a crash in between leaves them out of step
+        if (Q.dtype == np.int8 and Q.ndim == 2 and Q.shape[1] == EMBEDDING_DIM + 4
+                and len(names) == Q.shape[0]):
+            return names, Q
+
+    rebuild_packed_embeddings()
+    Q = np.load(EMBEDDINGS_FILE, mmap_mode=mmap_mode)
+    with open(NAMES_FILE) as f:
+        names = json.load(f)
+    return names, Q
+
+def rebuild_packed_embeddings():
+    """Rebuilds the packed embedding rows from the speakers stored in the database."""
+    with _DB_LOCK:
+        speakers = _CONN.execute("SELECT name, embedding FROM speakers").fetchall()
+
+    names = []
+    rows = []
+    for name, emb_blob in speakers:
+        if len(emb_blob) == EMBEDDING_DIM + 4:
+            rows.append(np.frombuffer(emb_blob, dtype=np.int8))
+        elif len(emb_blob) == EMBEDDING_DIM * 4:
+            # Rows registered before quantization hold raw float32 values
+            rows.append(np.frombuffer(quantize_embedding(np.frombuffer(emb_blob, dtype=np.float32)), dtype=np.int8))
+        else:
+            continue
+        names.append(name)
+
+    Q = np.vstack(rows) if rows else np.empty((0, EMBEDDING_DIM + 4), dtype=np.int8)
+    write_packed_embeddings(names, Q)
+
+def register_speaker(name, audio, session_id=None):
     """Registers a speaker by storing their voice embedding in the database."""
     try:
-        embedding = extract_embedding(audio_file)
+        embedding = extract_embedding(audio, session_id)
         if embedding is None or embedding.size == 0:
             return f"Failed to extract voice features for {name}. Please try again."
+
+        # Store the unit vector so cosine distance is just 1 - dot product
+        embedding = embedding.ravel() / max(np.linalg.norm(embedding), 1e-10)
+        emb_blob = quantize_embedding(embedding)
             
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("INSERT OR REPLACE INTO speakers (name, embedding) VALUES (?, ?)",
-                       (name, embedding.tobytes()))
-        conn.commit()
-        conn.close()
+        with _DB_LOCK, _CONN:
+            _CONN.execute("INSERT OR REPLACE INTO speakers (name, embedding) VALUES (?, ?)",
+                          (name, emb_blob))
+
+        with _SPK_LOCK:
+            # Replace the speaker's row (or append a new one) in the packed matrix
+            names, Q = read_packed_embeddings()
+            row = np.frombuffer(emb_blob, dtype=np.int8)
+            if row.size != Q.shape[1]:
+                rebuild_packed_embeddings()
+            elif name in names:
+                Q[names.index(name)] = row
+                write_packed_embeddings(names, Q)
+            else:
+                write_packed_embeddings(names + [name], np.vstack([Q, row]))
+
+            # Force the next identification to reload the stored embeddings
+            _SPK_CACHE["dirty"] = True
         return f"Speaker '{name}' registered successfully."
     except Exception as e:
         raise Exception(f"Error in register_speaker: {str(e)}")
 
-def identify_speaker(audio_file):
+def load_speaker_matrix():
+    """Returns the cached speaker names and their normalized embedding matrix.
+
+    The packed int8 rows are read and dequantized again only after a registration marks the cache as dirty.
+    """
+    with _SPK_LOCK:
+        if _SPK_CACHE["dirty"]:
+            names, Q = read_packed_embeddings(mmap_mode='r')
+            _SPK_CACHE["M"] = dequantize_embeddings(Q)
+            _SPK_CACHE["names"] = names
+            _SPK_CACHE["dirty"] = False
+        return _SPK_CACHE["names"], _SPK_CACHE["M"]
+
+def identify_speaker(audio, session_id=None):
     """Identifies the speaker by comparing the input voice sample to registered embeddings."""
     try:
-        input_embedding = extract_embedding(audio_file)
+        input_embedding = np.asarray(extract_embedding(audio, session_id), dtype=np.float32).ravel()
+        names, M = load_speaker_matrix()
         
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name, embedding FROM speakers")
-        speakers = cursor.fetchall()
-        conn.close()
-        
-        if not speakers:
+        if not names:
             return {
                 "status": "error",
                 "message": "No registered speakers found.",
                 "probabilities": {}
             }
 
-        best_match = None
-        best_score = float("inf")
-        all_scores = {}
-
-        for name, emb_blob in speakers:
-            stored_embedding = np.frombuffer(emb_blob, dtype=np.float32)
-            # Ensure the dimensions match before calculating cosine distance
-            if stored_embedding.shape != input_embedding.shape:
-                continue
-                
-            score = cosine(input_embedding, stored_embedding)
-            all_scores[name] = f"{(1-score)*100:.2f}%"
-            if score < best_score:
-                best_score = score
-                best_match = name
-
-        # If no valid comparisons were made
-        if best_match is None:
+        # Ensure the dimensions match before calculating cosine distance
+        if M.shape[1] != input_embedding.size:
             return {
                 "status": "error",
                 "message": "Could not compare voice with registered users.",
                 "probabilities": {}
             }
 
+        # Score all stored embeddings with a single SGEMV: scores = 1 - M @ q
+        # (M is C-ordered, so its transpose is handed to BLAS as a Fortran array without copying)
+        q = input_embedding / max(np.linalg.norm(input_embedding), 1e-10)
+        scores = sgemv(-1.0, M.T, q, beta=1.0, y=np.ones(len(names), dtype=np.float32),
+                       trans=1, overwrite_y=1)
+
+        all_scores = {name: f"{(1-score)*100:.2f}%" for name, score in zip(names, scores)}
+        best_index = int(np.argmin(scores))
+        best_match = names[best_index]
+        best_score = float(scores[best_index])
+
         confidence = (1 - best_score) * 100
         
         # Threshold for speaker similarity
@@ -122,43 +336,155 @@ def identify_speaker(audio_file):
             "probabilities": {}
         }
 
+@functools.lru_cache(maxsize=16)
 def butter_highpass(cutoff, fs, order=5):
-    """Design a highpass filter"""
+    """Design a highpass filter (cached, the coefficients only depend on the arguments)"""
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
     b, a = butter(order, normal_cutoff, btype='high', analog=False)
     return b, a
 
+@functools.lru_cache(maxsize=16)
+def butter_highpass_sos(cutoff, fs, order=5):
+    """Design a highpass filter as second-order sections, with the initial state and padding used by sosfiltfilt"""
+    nyq = 0.5 * fs
+    normal_cutoff = cutoff / nyq
+    sos = butter(order, normal_cutoff, btype='high', analog=False, output='sos')
+    zi = sosfilt_zi(sos)
+    # Same padding length as scipy.signal.sosfiltfilt
+    padlen = 3 * (2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum()))
+    return sos, zi, int(padlen)
+
+def highpass_and_gate(x, sos, zi, padlen, threshold, out):
+    """Forward-backward highpass (as sosfiltfilt) and noise gate fused into a single loop"""
+    n = x.shape[0]
+
+    # Odd extension of the signal on both ends
+    ext = np.empty(n + 2 * padlen, dtype=np.float64)
+    for i in range(padlen):
+        ext[i] = 2.0 * x[0] - x[padlen - i]
+        ext[n + padlen + i] = 2.0 * x[n - 1] - x[n - 2 - i]
+    for i in range(n):
+        ext[padlen + i] = x[i]
+
+    # Forward pass, cascade of transposed direct-form II biquads
+    z = zi * ext[0]
+    for i in range(ext.shape[0]):
+        v = ext[i]
+        for s in range(sos.shape[0]):
+            y = sos[s, 0] * v + z[s, 0]
+            z[s, 0] = sos[s, 1] * v - sos[s, 4] * y + z[s, 1]
+            z[s, 1] = sos[s, 2] * v - sos[s, 5] * y
+            v = y
+        ext[i] = v
+
+    # Backward pass
+    z = zi * ext[ext.shape[0] - 1]
+    for i in range(ext.shape[0] - 1, -1, -1):
+        v = ext[i]
+        for s in range(sos.shape[0]):
+            y = sos[s, 0] * v + z[s, 0]
+            z[s, 0] = sos[s, 1] * v - sos[s, 4] * y + z[s, 1]
+            z[s, 1] = sos[s, 2] * v - sos[s, 5] * y
+            v = y
+        ext[i] = v
+
+    # Noise gate while copying out the unpadded part
+    for i in range(n):
+        v = ext[padlen + i]
+        out[i] = 0.0 if abs(v) < threshold else v
+    return out
+
+if njit is not None:
+    highpass_and_gate = njit(fastmath=True, cache=True)(highpass_and_gate)
+
 def apply_highpass_filter(data, cutoff, fs, order=5):
     """Apply highpass filter to remove low-frequency noise"""
     b, a = butter_highpass(cutoff, fs, order=order)
     return filtfilt(b, a, data)
 
-def remove_noise(audio, sr):
-    """Apply noise reduction techniques"""
+def stft(x):
+    """STFT framed like librosa.stft (centered, zero padded), returned as (bins, frames)"""
+    padded = np.pad(x, N_FFT // 2)
+    frames = sliding_window_view(padded, N_FFT)[::HOP_LENGTH]
+    planned = _FFT_PLANS.get(frames.shape)
+    if planned is None:
+        return scipy.fft.rfft(frames * STFT_WINDOW, axis=-1, workers=-1).T
+
+    # Window the frames straight into the plan's input buffer, which is shared between threads
+    plan, lock = planned
+    with lock:
+        np.multiply(frames, STFT_WINDOW, out=plan.input_array)
+        return plan().T.copy()
+
+def noise_power_spectrum(noise_sample):
+    """Mean power spectrum of a noise sample"""
+    spectrum = stft(noise_sample)
+    return np.mean(spectrum.real**2 + spectrum.imag**2, axis=1)
+
+def session_noise_spectrum(session_id, noise_sample, sr):
+    """Noise spectrum of a recording session, estimated from noise_sample when the session is new or its estimate expired"""
+    if session_id is None:
+        return noise_power_spectrum(noise_sample)
+
+    key = (session_id, sr)
+    with _NOISE_LOCK:
+        if key in _NOISE_CACHE:
+            created, noise_spectrum = _NOISE_CACHE[key]
+            if time.monotonic() - created < NOISE_SESSION_TTL:
+                _NOISE_CACHE.move_to_end(key)
+                return noise_spectrum
+            del _NOISE_CACHE[key]
+
+    noise_spectrum = noise_power_spectrum(noise_sample)
+    with _NOISE_LOCK:
+        _NOISE_CACHE[key] = (time.monotonic(), noise_spectrum)
+        if len(_NOISE_CACHE) > _NOISE_CACHE_SIZE:
+            _NOISE_CACHE.popitem(last=False)
+    return noise_spectrum
+
+def remove_noise(audio, sr, session_id=None):
+    """Apply noise reduction techniques, reusing the noise estimate of session_id if one is given"""
+    if not APPLY_DENOISE:
+        return audio
+    audio = np.asarray(audio, dtype=np.float32)
+
     # 1. High-pass filter (removes low frequency noise, e.g., humming)
-    audio_filtered = apply_highpass_filter(audio, cutoff=100, fs=sr)
-    
     # 2. Simple noise gate (silence parts with low amplitude)
     noise_gate_threshold = 0.01
-    audio_gated = audio_filtered.copy()
-    audio_gated[np.abs(audio_gated) < noise_gate_threshold] = 0
+    sos, zi, padlen = butter_highpass_sos(100, sr)
+    if njit is not None and len(audio) > padlen:
+        audio_gated = highpass_and_gate(audio, sos, zi, padlen, noise_gate_threshold,
+                                        np.empty_like(audio))
+    else:
+        audio_filtered = apply_highpass_filter(audio, cutoff=100, fs=sr)
+        # Turn |x| into a 0/1 gate in the same buffer (no bool mask), then gate and cast to float32 in one pass
+        gate = np.abs(audio_filtered)
+        np.greater_equal(gate, noise_gate_threshold, out=gate)
+        audio_gated = np.multiply(audio_filtered, gate, out=np.empty_like(audio), casting='same_kind')
     
     # 3. Spectral subtraction (estimate noise from first 0.5s and subtract)
     if len(audio) > sr * 0.5:  # Ensure we have at least 0.5s of audio
         noise_sample = audio[:int(sr * 0.5)]
-        noise_spectrum = np.mean(np.abs(librosa.stft(noise_sample))**2, axis=1)
-        audio_stft = librosa.stft(audio_gated)
-        audio_spec = np.abs(audio_stft)**2
+        noise_spectrum = session_noise_spectrum(session_id, noise_sample, sr)
+        audio_stft = stft(audio_gated)
+        audio_mag = np.abs(audio_stft)
+        audio_spec = audio_mag * audio_mag
         
         # Calculate reduction factor (avoiding complete elimination)
         reduction_factor = 0.7
         
         # Apply spectral subtraction with flooring to avoid negative values
-        audio_spec_sub = np.maximum(audio_spec - reduction_factor * noise_spectrum.reshape(-1, 1), 0.01 * audio_spec)
+        gain = np.maximum(audio_spec - reduction_factor * noise_spectrum.reshape(-1, 1), 0.01 * audio_spec)
+        
+        # Turn the subtracted power into a magnitude gain so the phase of the STFT is kept as is
+        np.sqrt(gain, out=gain)
+        gain /= np.maximum(audio_mag, 1e-10)
         
         # Convert back to time domain
-        audio_denoised = librosa.istft(audio_spec_sub**(1/2) * np.exp(1j * np.angle(audio_stft)))
+        audio_stft *= gain
+        audio_denoised = librosa.istft(audio_stft, hop_length=HOP_LENGTH,
+                                       window=STFT_WINDOW, dtype=np.float32)
         
         # Ensure same length as original
         if len(audio_denoised) >= len(audio):
@@ -311,6 +637,9 @@ def index():
         </div>
         
         <script>
+            // Identifies this page for the server's noise estimate, a new page starts a new session
+            const sessionId = Math.random().toString(36).slice(2) + Date.now().toString(36);
+
             function openTab(evt, tabName) {
                 var i, tabcontent, tablinks;
                 tabcontent = document.getElementsByClassName("tabcontent");
@@ -373,7 +702,7 @@ def index():
             }
             
             function checkResult(filePath) {
-                fetch('/classify?file=' + filePath)
+                fetch('/classify?file=' + filePath + '&session=' + sessionId)
                     .then(response => response.json())
                     .then(data => {
                         document.getElementById('verifyStatus').innerText = 'Analysis complete';
@@ -410,7 +739,7 @@ def index():
             }
             
             function checkRegistration(filePath, userName) {
-                fetch(`/register?file=${filePath}&name=${encodeURIComponent(userName)}`)
+                fetch(`/register?file=${filePath}&name=${encodeURIComponent(userName)}&session=${sessionId}`)
                     .then(response => response.json())
                     .then(data => {
                         document.getElementById('registerStatus').innerText = 'Registration complete';
@@ -434,21 +763,31 @@ def record():
     timestamp = time.strftime("%Y%m%d-%H%M%S")
     user_name = request.args.get('userName', '')
     
+    # Timestamps only have one-second resolution, make concurrent recordings distinct
+    suffix = uuid.uuid4().hex[:8]
     if user_name:
-        output_path = f"{RECORDING_DIR}/register-{user_name}-{timestamp}.wav"
+        output_path = f"{RECORDING_DIR}/register-{user_name}-{timestamp}-{suffix}.wav"
     else:
-        output_path = f"{RECORDING_DIR}/verify-{timestamp}.wav"
+        output_path = f"{RECORDING_DIR}/verify-{timestamp}-{suffix}.wav"
     
     try:
-        # Use subprocess to call ffmpeg
-        subprocess.Popen([
+        # Use subprocess to call ffmpeg, streaming raw 16-bit mono PCM to its stdout
+        proc = subprocess.Popen([
             'ffmpeg',
+            '-nostdin',
             '-i', STREAM_URL,
             '-t', str(DURATION),
-            '-acodec', 'copy',
-            '-y',
-            output_path
-        ])
+            '-f', 's16le',
+            '-ac', '1',
+            '-ar', str(SAMPLE_RATE),
+            '-'
+        ], stdout=subprocess.PIPE)
+
+        # Drain the pipe while recording so ffmpeg never blocks on a full pipe
+        recording = {"proc": proc, "pcm": np.empty(DURATION * SAMPLE_RATE, dtype=np.int16), "size": 0,
+                     "done": threading.Event()}
+        _RECORDINGS[output_path] = recording
+        threading.Thread(target=capture_pcm, args=(output_path, recording), daemon=True).start()
         
         return jsonify({
             "status": "success", 
@@ -462,6 +801,61 @@ def record():
             "message": f"Recording error: {str(e)}"
         })
 
+def capture_pcm(output_path, recording):
+    """Reads ffmpeg's raw PCM output straight into the recording's preallocated buffer.
+
+    The recording is dropped if nobody collects it within RECORDING_TTL seconds after it ends.
+    """
+    proc = recording["proc"]
+
+    # Stop ffmpeg if the stream stalls
+    watchdog = threading.Timer(DURATION + RECORDING_TTL, proc.kill)
+    watchdog.daemon = True
+    watchdog.start()
+
+    buf = memoryview(recording["pcm"]).cast('B')
+    size = 0
+    while size < len(buf):
+        n = proc.stdout.readinto(buf[size:])
+        if not n:
+            break
+        size += n
+    recording["size"] = size // 2
+
+    # Discard anything past the expected duration so ffmpeg can exit
+    while proc.stdout.read(65536):
+        pass
+    proc.wait()
+    watchdog.cancel()
+    recording["done"].set()
+
+    # Release the buffer and process handle of recordings that were never collected
+    time.sleep(RECORDING_TTL)
+    _RECORDINGS.pop(output_path, None)
+
+def wait_for_recording(file_path):
+    """Blocks until the recording is captured, returns its samples or None if it is not usable."""
+    recording = _RECORDINGS.pop(file_path, None)
+    if recording is None:
+        # Recordings not made by this process can still be read from disk
+        if not os.path.exists(file_path):
+            return None
+        try:
+            return load_audio(file_path)
+        except Exception:
+            return None
+
+    if not recording["done"].wait(timeout=DURATION + 5):
+        recording["proc"].kill()
+        recording["done"].wait()
+        return None
+    if recording["size"] == 0:
+        return None
+
+    audio = recording["pcm"][:recording["size"]].astype(np.float32)
+    audio /= 32768.0
+    return audio
+
 @app.route('/register')
 def register():
     file_path = request.args.get('file')
@@ -473,25 +867,17 @@ def register():
             "message": "No name provided for registration"
         })
     
-    # Wait for file to be completely written
-    max_wait = 5  # Maximum wait time in seconds
-    wait_time = 0
-    while not os.path.exists(file_path) and wait_time < max_wait:
-        time.sleep(0.5)
-        wait_time += 0.5
-    
-    if not os.path.exists(file_path):
+    # Wait for ffmpeg to finish the recording
+    audio = wait_for_recording(file_path)
+    if audio is None:
         return jsonify({
             "status": "error",
-            "message": "Recording file not found"
+            "message": "Recording not found"
         })
-        
-    # Give ffmpeg a moment to finish writing the file
-    time.sleep(2)
-    
+
     try:
         # Register the speaker
-        message = register_speaker(name, file_path)
+        message = register_speaker(name, audio, request.args.get('session'))
         return jsonify({
             "status": "success",
             "message": message
@@ -513,25 +899,17 @@ def classify():
             "probabilities": {}
         })
     
-    # Wait for file to be completely written
-    max_wait = 5  # Maximum wait time in seconds
-    wait_time = 0
-    while not os.path.exists(file_path) and wait_time < max_wait:
-        time.sleep(0.5)
-        wait_time += 0.5
-    
-    if not os.path.exists(file_path):
+    # Wait for ffmpeg to finish the recording
+    audio = wait_for_recording(file_path)
+    if audio is None:
         return jsonify({
             "status": "error",
-            "message": "Recording file not found",
+            "message": "Recording not found",
             "probabilities": {}
         })
-        
-    # Give ffmpeg a moment to finish writing the file
-    time.sleep(2)
-    
+
     # Identify the speaker
-    result = identify_speaker(file_path)
+    result = identify_speaker(audio, request.args.get('session'))
     return jsonify(result)
 
 if __name__ == '__main__':